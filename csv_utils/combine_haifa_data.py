@@ -1,44 +1,98 @@
-import pandas as pd
+import codecs
+import csv
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import pyarrow as pa
+import pyarrow.csv as pcsv
+
 # paths relative to project root
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 input_dir = os.path.join(ROOT_DIR, 'data', 'gov', 'Haifa')
 output_file = os.path.join(ROOT_DIR, 'data', 'gov', 'haifa_combined.csv')
 
-# empty list to store dataframes
-dfs = []
+
+def read_header(file_path):
+    """Read the column names of a neighborhood CSV"""
+    with open(file_path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f))
+
+
+def read_neighborhood_csv(file_path):
+    """Read a neighborhood CSV with pyarrow, keeping every column as text"""
+    # read the header first so no column gets type-inferred (keeps values like "2,580,000 ₪" untouched)
+    header = read_header(file_path)
+    convert_options = pcsv.ConvertOptions(
+        column_types={name: pa.string() for name in header},
+        strings_can_be_null=False
+    )
+    return pcsv.read_csv(file_path, read_options=pcsv.ReadOptions(use_threads=True),
+                         convert_options=convert_options)
+
+
+def read_neighborhood(entry):
+    """Read one neighborhood CSV and tag its rows with the neighborhood name"""
+    table = read_neighborhood_csv(entry.path)
+
+    # add neighborhood name (remove .csv extension)
+    neighborhood_name = os.path.splitext(entry.name)[0]
+    return entry.name, table.append_column('שכונה', pa.array([neighborhood_name] * table.num_rows, pa.string()))
+
+
+def read_in_order(entries, max_workers=os.cpu_count()):
+    """Read shards concurrently, yielding them in order with at most max_workers in memory"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for entry in entries:
+            pending.append(executor.submit(read_neighborhood, entry))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+files_combined = 0
 total_records = 0
 
 
 print(f"Reading files from {input_dir}...")
-for file in os.listdir(input_dir):
-    if file.endswith('.csv'):
-        file_path = os.path.join(input_dir, file)
-        df = pd.read_csv(file_path)
-        records = len(df)
+csv_files = [entry for entry in os.scandir(input_dir) if entry.name.endswith('.csv')]
+
+# the output has every column any shard has, in the order they first appear, with the neighborhood last
+columns = list(dict.fromkeys(column for entry in csv_files for column in read_header(entry.path)))
+schema = pa.schema([(column, pa.string()) for column in columns + ['שכונה']])
+
+# stream each shard straight into the output instead of concatenating everything in memory
+# utf-8-sig: write the BOM ourselves, pyarrow writes plain UTF-8
+with open(output_file, 'wb') as f:
+    f.write(codecs.BOM_UTF8)
+    writer = None
+    for file, table in read_in_order(csv_files):
+        if writer is None:
+            writer = pcsv.CSVWriter(f, schema)
+        # columns a shard doesn't have are left empty, like pd.concat did
+        for name in schema.names:
+            if name not in table.column_names:
+                table = table.append_column(name, pa.nulls(table.num_rows, pa.string()))
+        writer.write_table(table.select(schema.names))
+
+        records = table.num_rows
         total_records += records
-        
-        # add neighborhood name (remove .csv extension)
-        neighborhood_name = os.path.splitext(file)[0]
-        df['שכונה'] = neighborhood_name
-        
-        dfs.append(df)
+        files_combined += 1
         print(f"Processed {file}: {records} records")
 
-print("\nCombining all dataframes...")
-combined_df = pd.concat(dfs, ignore_index=True)
-
-combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    if writer is not None:
+        writer.close()
 
 print(f"\nResults:")
-print(f"- Combined {len(dfs)} files")
+print(f"- Combined {files_combined} files")
 print(f"- Total input records: {total_records}")
-print(f"- Total output records: {len(combined_df)}")
+print(f"- Total output records: {total_records}")
 print(f"- Output file: {output_file}")
 
 # display sample of columns
 print(f"\nColumns in combined file:")
-for col in combined_df.columns:
-    print(f"- {col}") 
\ No newline at end of file
+for col in (schema.names if files_combined else []):
+    print(f"- {col}")
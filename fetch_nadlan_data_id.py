@@ -1,21 +1,21 @@
-import time
+import codecs
+from array import array
 import os
-import json
-from datetime import datetime
 import logging
-from queue import Queue
-from threading import Lock
+import re
+from collections import defaultdict
+from queue import Queue, SimpleQueue
+from threading import Lock, Thread
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import hashlib
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait as wait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import StaleElementReferenceException
-import pandas as pd
+import orjson
+import xxhash
+import pyarrow as pa
+import pyarrow.csv as pcsv
 from selenium.webdriver.common.keys import Keys
 
 # Set up logging
@@ -41,39 +41,196 @@ NEIGHBORHOOD_IDS = [
     # {"id": "65211069", "name": "המושבה הגרמנית"}
 ]
 CHECKPOINT_INTERVAL = 100  # Save every 100 records
+CHECKPOINT_MAX_BYTES = 50 * 1024 * 1024  # Start a new checkpoint file past 50 MB
 CHECKPOINT_DIR = 'checkpoints'
 DATA_DIR = 'data/gov'
-MAX_WORKERS = 3 # len(NEIGHBORHOOD_IDS)  # One thread per neighborhood
+MAX_WORKERS = min(len(NEIGHBORHOOD_IDS), os.cpu_count() or 1)  # One browser per neighborhood, at most one per core
 MAX_PAGES = 100  # Maximum number of pages to process
+HEADLESS = True  # Run Chrome without a window
+MAX_USES_PER_BROWSER = 50  # Restart a browser after this many neighborhoods to keep its memory in check
+FORCE_RESCRAPE = os.environ.get('FORCE_RESCRAPE') == '1'  # Ignore saved page progress and start from page 1
+CHROME_PROFILE_DIR = os.path.join('chrome_profiles', 'neighborhood_id')  # Kept between runs so Chrome starts with a warm cache
+
+# Output columns, in the order they are written to the CSV
+COLUMNS = ['כתובת', 'מ"ר', 'תאריך עסקה', 'מחיר', 'גוש/חלקה/תת-חלקה', 'סוג נכס', 'חדרים', 'קומה',
+           'שנת בנייה', 'מחיר למ"ר', 'קומות במבנה']
+CSV_SCHEMA = pa.schema([(column, pa.string()) for column in COLUMNS])
+CSV_BATCH_SIZE = 10000  # Records converted to Arrow and written to the CSV at a time
+
+ROW_EXPAND_TIMEOUT = 2  # Seconds to wait for a row's inner table to open or close
+NEXT_PAGE_TIMEOUT = 10  # Seconds to wait for the next page of results to replace the current one
+
+# Locators for the elements still looked up through WebDriver (rows and pages are read by the scripts below)
+# The header is a .mainTable__row as well
+RESULTS_ROWS = (By.CSS_SELECTOR, ".mainTable .mainTable__row")
+
+# Reads the main cells of every row of the results table (header row skipped) in a
+# single WebDriver call, without expanding any of them
+ROW_CELLS_SCRIPT = """
+const table = document.querySelector('.mainTable');
+if (!table) {
+    throw new Error('mainTable not found');
+}
+return Array.from(table.querySelectorAll('.mainTable__row'), row =>
+    Array.from(row.querySelectorAll('.mainTable__cell'), cell => cell.innerText)).slice(1);
+"""
+
+# Reads the inner tables of the given rows (indexes into the rows above) in a single
+# WebDriver call, null for a row without an arrow. Each row is expanded, its inner
+# table harvested and collapsed again, all inside the page.
+# Instead of fixed sleeps it polls the DOM until the inner table has rendered
+# (and is gone again after collapsing), giving up after ROW_EXPAND_TIMEOUT.
+# The inner table is looked up in the whole table, so once a row fails to open or close in
+# time the rest of the page is left unread ([] for it and every row after it) rather than
+# risk reading one row's inner table for another.
+# The table itself is looked up in the page as well, so no element handle can go stale.
+EXPAND_ROWS_SCRIPT = """
+const table = document.querySelector('.mainTable');
+const indexes = arguments[0];
+const timeout = arguments[1];
+const done = arguments[arguments.length - 1];
+const texts = (root, selector) => Array.from(root.querySelectorAll(selector), cell => cell.innerText);
+const waitFor = check => new Promise(resolve => {
+    const deadline = Date.now() + timeout;
+    const poll = () => {
+        const result = check();
+        if (result || Date.now() > deadline) {
+            resolve(result);
+        } else {
+            setTimeout(poll, 20);
+        }
+    };
+    poll();
+});
+const openContainer = () => {
+    const container = table.querySelector('.innerTablesContainer');
+    return container && container.querySelector('.innerTable__cell') ? container : null;
+};
+(async () => {
+    if (!table) {
+        throw new Error('mainTable not found');
+    }
+    const rows = Array.from(table.querySelectorAll('.mainTable__row')).slice(1);
+    const innerTables = [];
+    let stuck = Boolean(table.querySelector('.innerTablesContainer'));
+    for (const index of indexes) {
+        if (stuck) {
+            innerTables.push([]);
+            continue;
+        }
+        const arrow = rows[index] ? rows[index].querySelector('.collapseArrow') : null;
+        if (!arrow) {
+            innerTables.push(null);
+            continue;
+        }
+        arrow.click();
+        const container = await waitFor(openContainer);
+        if (!container) {
+            // The row may still open late and would then show up as the next row's inner table
+            stuck = true;
+            innerTables.push([]);
+            continue;
+        }
+        innerTables.push(texts(container, '.innerTable__cell'));
+        arrow.click();
+        stuck = !await waitFor(() => !table.querySelector('.innerTablesContainer'));
+    }
+    return innerTables;
+})().then(done, error => done({error: String(error)}));
+"""
+
+# Moves to the next page of results in a single WebDriver call: checks the "next" button,
+# clicks it and polls until a first data row is rendered that differs from the old one,
+# so a table that was only cleared does not count as the next page.
+# The button only counts as available when it is enabled and actually shown: it has a size,
+# is not visibility-hidden and neither it nor an ancestor is fully transparent.
+# Resolves to 'missing' / 'unavailable' when there is no further page, otherwise
+# 'changed', or 'timeout' after NEXT_PAGE_TIMEOUT.
+NEXT_PAGE_SCRIPT = """
+const timeout = arguments[0];
+const done = arguments[arguments.length - 1];
+const next = document.getElementById('next');
+if (!next) {
+    done('missing');
+    return;
+}
+const shown = element => {
+    const box = element.getBoundingClientRect();
+    if (!box.width || !box.height || getComputedStyle(element).visibility !== 'visible') {
+        return false;
+    }
+    for (let node = element; node; node = node.parentElement) {
+        if (Number(getComputedStyle(node).opacity) === 0) {
+            return false;
+        }
+    }
+    return true;
+};
+if (next.disabled || !shown(next)) {
+    done('unavailable');
+    return;
+}
+const firstRow = document.querySelectorAll('.mainTable__row')[1];
+const firstRowText = firstRow ? firstRow.innerText : null;
+next.scrollIntoView(true);
+next.click();
+const deadline = Date.now() + timeout;
+const poll = () => {
+    const row = document.querySelectorAll('.mainTable__row')[1];
+    if (row && row.isConnected && row.innerText !== firstRowText) {
+        done('changed');
+    } else if (Date.now() > deadline) {
+        done('timeout');
+    } else {
+        setTimeout(poll, 20);
+    }
+};
+poll();
+"""
 
 # Create necessary directories
 os.makedirs(CHECKPOINT_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Global lock for thread-safe operations
-checkpoint_lock = Lock()
-logging_lock = Lock()
+# Checkpoint files are namespaced per neighborhood, so each neighborhood gets its own lock
+checkpoint_locks = defaultdict(Lock)
+checkpoint_index_lock = Lock()
+
+# Checkpoint filenames: checkpoint_<neighborhood>_<n>.jsonl and the older checkpoint_<neighborhood>_<timestamp>_<n>.json
+CHECKPOINT_FILE_PATTERN = re.compile(r'checkpoint_(.+)_(\d+)\.jsonl')
+LEGACY_CHECKPOINT_FILE_PATTERN = re.compile(r'checkpoint_(.+)_(\d{8}_\d{6})_(\d+)\.json')
+
+# Checkpoint files grouped by neighborhood, built by a single directory scan on first load
+checkpoint_index = None
+
+# fsyncs and sidecar writes queued by the scraping threads, run in order by checkpoint_writer.
+# A None entry tells the writer to stop once everything queued before it is done
+checkpoint_writes = SimpleQueue()
 
 
 def thread_safe_log(message, level='info'):
     """Thread-safe logging function"""
-    with logging_lock:
-        if level == 'info':
-            logger.info(message)
-        elif level == 'error':
-            logger.error(message)
-        elif level == 'warning':
-            logger.warning(message)
+    # Logging handlers lock around each record themselves, no extra lock needed
+    getattr(logger, level)(message)
 
 
 def create_record_hash(record):
     """Create a unique hash for a record to detect duplicates"""
     # Create a string from key fields that should be unique
-    key_fields = f"{record.get('כתובת', '')}-{record.get('תאריך עסקה', '')}-{record.get('מחיר', '')}-{record.get('גוש/חלקה/תת-חלקה', '')}"
-    return hashlib.md5(key_fields.encode('utf-8')).hexdigest()
+    # \x1f (unit separator) can't appear in the scraped text, so different fields never run together
+    key_fields = f"{record.get('כתובת', '')}\x1f{record.get('תאריך עסקה', '')}\x1f{record.get('מחיר', '')}\x1f{record.get('גוש/חלקה/תת-חלקה', '')}"
+    # A 64-bit int is plenty for dedup and much smaller in seen_hashes than an MD5 hex string
+    return xxhash.xxh3_64_intdigest(key_fields.encode('utf-8'))
+
+
+def stored_record_hash(record):
+    """Return the hash stored with a checkpoint record, computing it for records written before it was stored"""
+    record_hash = record.get('_h')
+    return create_record_hash(record) if record_hash is None else record_hash
 
 
-def create_browser():
+def create_browser(profile_dir=None):
     """Create a new Chrome browser instance with thread-safe options and WebGL fallback fix"""
     service = Service(DRIVER_PATH)
     options = webdriver.ChromeOptions()
@@ -94,8 +251,23 @@ def create_browser():
     options.add_argument('--enable-unsafe-swiftshader')
     options.add_argument('--use-gl=swiftshader')
     
-    # Optional: run headless if you want (uncomment if needed)
-    # options.add_argument('--headless=new')
+    # Reuse the profile of the previous run, concurrent browsers must not share one
+    if profile_dir:
+        options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
+    # Only the DOM is read, skip everything that just costs load time
+    if HEADLESS:
+        options.add_argument('--headless=new')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_argument('--disable-remote-fonts')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-background-networking')
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.default_content_setting_values.notifications': 2
+    })
+    
+    # Return from browser.get() once the DOM is ready instead of waiting for every resource
+    options.page_load_strategy = 'eager'
     
     # Use a random remote debugging port for parallel instances
     options.add_argument('--remote-debugging-port=0')
@@ -106,96 +278,405 @@ def create_browser():
     browser.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     
     browser.set_window_size(1500, 1000)
+    # Page extraction waits on every row of the page, allow it more than the default 30 s
+    browser.set_script_timeout(120)
     return browser
 
 
+def quit_browser(browser):
+    try:
+        browser.quit()
+    except:
+        pass
+
+
+class BrowserPool:
+    """Thread-safe pool of browsers, each lent to one neighborhood at a time"""
+
+    def __init__(self, size):
+        # An empty slot (None) stands for a browser that is started on first use,
+        # each slot keeps its own Chrome profile
+        self.idle = Queue()
+        for slot in range(size):
+            self.idle.put((slot, None))
+        self.slots = {}
+        self.uses = {}
+        self.lock = Lock()
+
+    def acquire(self):
+        """Take a browser from the pool, waiting for one to be released if all are in use"""
+        slot, browser = self.idle.get()
+        if browser is None:
+            try:
+                browser = self.start_browser(slot)
+            except:
+                self.idle.put((slot, None))
+                raise
+            with self.lock:
+                self.slots[browser] = slot
+                self.uses[browser] = 0
+        return browser
+
+    def start_browser(self, slot):
+        """Start a browser on the slot's own profile, or on a temporary one while that profile is in use"""
+        try:
+            return create_browser(os.path.join(CHROME_PROFILE_DIR, f'profile_{slot}'))
+        except Exception as e:
+            # Chrome won't open a profile another run still holds
+            thread_safe_log(f"Chrome profile {slot} is unavailable, using a temporary profile: {e}", 'warning')
+            return create_browser()
+
+    def release(self, browser, healthy=True):
+        """Return a browser to the pool, replacing it if it broke or has been used too often"""
+        if healthy:
+            # Hand the next neighborhood a blank page without this one's cookies
+            try:
+                browser.delete_all_cookies()
+                browser.get('about:blank')
+            except:
+                healthy = False
+        with self.lock:
+            slot = self.slots[browser]
+            self.uses[browser] += 1
+            retire = not healthy or self.uses[browser] >= MAX_USES_PER_BROWSER
+            if retire:
+                del self.slots[browser]
+                del self.uses[browser]
+        if retire:
+            quit_browser(browser)
+            browser = None
+        self.idle.put((slot, browser))
+
+    def close_all(self):
+        """Quit every browser the pool has started"""
+        with self.lock:
+            browsers = list(self.uses)
+            self.slots.clear()
+            self.uses.clear()
+        for browser in browsers:
+            quit_browser(browser)
+
+
+# Shared by the worker threads, one browser per concurrent neighborhood
+browser_pool = BrowserPool(MAX_WORKERS)
+
+
 def safe_get(features, idx):
-    return features[idx].text.strip() if len(features) > idx else ""
+    return features[idx].strip() if len(features) > idx else ""
 
 
 def extract_multiple_transactions(features, base_row_data):
     """Extract multiple transactions from a single row, including the original"""
-    transactions = []
-    
     # First, add the original transaction
-    transactions.append(base_row_data.copy())
+    transactions = [base_row_data]
     
     # Then check for additional transactions starting from index 8
     previous_deals_index = 8
     while safe_get(features, previous_deals_index):
-        # Create a new transaction with all the base data
-        additional_transaction = base_row_data.copy()
-        
-        # Update only the date and price from the additional transaction
-        if safe_get(features, previous_deals_index):
-            additional_transaction['תאריך עסקה'] = safe_get(features, previous_deals_index)
-        if safe_get(features, previous_deals_index + 1):
-            additional_transaction['מחיר'] = safe_get(features, previous_deals_index + 1)
-            
-        transactions.append(additional_transaction)
+        # Create a new transaction with all the base data, updating only the date and price
+        transaction_price = safe_get(features, previous_deals_index + 1)
+        transactions.append({
+            **base_row_data,
+            'תאריך עסקה': safe_get(features, previous_deals_index),
+            'מחיר': transaction_price or base_row_data['מחיר']
+        })
         previous_deals_index += 2
     
     return transactions
 
 
-def save_checkpoint(data, seen_hashes, checkpoint_num, neighborhood_name):
-    """Save checkpoint with both data and seen hashes - thread-safe"""
-    with checkpoint_lock:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        checkpoint_file = os.path.join(CHECKPOINT_DIR, f'checkpoint_{neighborhood_name}_{timestamp}_{checkpoint_num}.json')
-        checkpoint_data = {
-            'data': data,
-            'seen_hashes': list(seen_hashes),
-            'timestamp': timestamp,
-            'record_count': len(data)
-        }
-        with open(checkpoint_file, 'w', encoding='utf-8') as f:
-            json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
-        thread_safe_log(f"Saved checkpoint {checkpoint_num} with {len(data)} unique records for {neighborhood_name}")
+def checkpoint_path(neighborhood_name, checkpoint_num):
+    return os.path.join(CHECKPOINT_DIR, f'checkpoint_{neighborhood_name}_{checkpoint_num}.jsonl')
 
 
-def load_latest_checkpoint(neighborhood_name):
-    """Load the latest checkpoint with seen hashes - thread-safe"""
-    with checkpoint_lock:
-        checkpoint_files = [f for f in os.listdir(CHECKPOINT_DIR) if f.startswith(f'checkpoint_{neighborhood_name}_')]
-        if not checkpoint_files:
-            return None, set(), 0
+def open_checkpoint(neighborhood_name, checkpoint_num):
+    """Open a checkpoint file for appending records, one JSON object per line"""
+    checkpoint_file = checkpoint_path(neighborhood_name, checkpoint_num)
+    checkpoint = open(checkpoint_file, 'ab')
 
-        latest_checkpoint = max(checkpoint_files)
-        checkpoint_num = int(latest_checkpoint.split('_')[-1].split('.')[0])
+    # Terminate a line cut short by an interrupted run so new records start on a fresh line
+    if checkpoint.tell():
+        with open(checkpoint_file, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                checkpoint.write(b'\n')
+    return checkpoint
 
+
+def checkpoint_writer():
+    """Run the queued checkpoint writes one after another, off the scraping threads"""
+    while True:
+        job = checkpoint_writes.get()
+        if job is None:
+            break
+        write, args = job
+        try:
+            write(*args)
+        except Exception as e:
+            thread_safe_log(f"Error writing checkpoint: {e}", 'error')
+
+
+def sync_file(path):
+    with open(path, 'ab') as f:
+        os.fsync(f.fileno())
+
+
+def save_checkpoint(checkpoint, checkpoint_num, unsaved_hashes, record_count, neighborhood_name, pages_done):
+    """Flush the checkpoint file, moving on to a new one once it grows too large - thread-safe"""
+    with checkpoint_locks[neighborhood_name]:
+        checkpoint.flush()
+        # The writer syncs the records before writing the sidecars that cover them,
+        # so the sidecars never run ahead of the data
+        checkpoint_writes.put((sync_file, (checkpoint_path(neighborhood_name, checkpoint_num),)))
+        checkpoint_writes.put((append_seen_hashes, (neighborhood_name, unsaved_hashes, record_count, checkpoint_num,
+                                                    checkpoint.tell())))
+        checkpoint_writes.put((save_progress, (neighborhood_name, pages_done, checkpoint_num)))
+        thread_safe_log(f"Saved checkpoint {checkpoint_num} with {record_count} unique records for {neighborhood_name}")
+        if checkpoint.tell() < CHECKPOINT_MAX_BYTES:
+            return checkpoint, checkpoint_num
+
+        checkpoint.close()
+        checkpoint_num += 1
+        return open_checkpoint(neighborhood_name, checkpoint_num), checkpoint_num
+
+
+def write_file_atomic(path, data):
+    """Replace the file at path in one step, keeping the previous version as path.bak"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, path + '.bak')
+    os.replace(tmp_path, path)
+
+
+def load_json_file(path):
+    """Load a JSON sidecar, falling back to its .bak copy if it is missing or corrupt"""
+    for candidate in (path, path + '.bak'):
         try:
-            with open(os.path.join(CHECKPOINT_DIR, latest_checkpoint), 'r', encoding='utf-8') as f:
-                checkpoint_data = json.load(f)
-
-            # Handle both old and new checkpoint formats
-            if isinstance(checkpoint_data, list):
-                # Old format - just data
-                data = checkpoint_data
-                seen_hashes = {create_record_hash(record) for record in data}
+            with open(candidate, 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            continue
+    return None
+
+
+def seen_path(neighborhood_name):
+    return os.path.join(CHECKPOINT_DIR, f'seen_{neighborhood_name}.json')
+
+
+def seen_hashes_path(neighborhood_name):
+    return os.path.join(CHECKPOINT_DIR, f'seen_{neighborhood_name}.bin')
+
+
+def append_seen_hashes(neighborhood_name, new_hashes, record_count, checkpoint_num, offset):
+    """Append the hashes added since the last checkpoint and record the checkpoint position they cover"""
+    # The hashes are kept as raw uint64s, only the new ones are written each time
+    with open(seen_hashes_path(neighborhood_name), 'ab') as f:
+        f.write(array('Q', new_hashes).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        count = f.tell() // 8
+    seen = {'seq': checkpoint_num, 'offset': offset, 'records': record_count, 'count': count}
+    write_file_atomic(seen_path(neighborhood_name), orjson.dumps(seen))
+
+
+def load_seen_hashes(neighborhood_name, checkpoint_num):
+    """Load the seen hashes sidecars, or None if they are missing or don't match the checkpoint files"""
+    try:
+        seen = load_json_file(seen_path(neighborhood_name))
+        if seen is None:
+            return None
+        # Checkpoint files that were removed or cut short since the sidecar was written make it unusable
+        if seen['seq'] > checkpoint_num or seen['offset'] > os.path.getsize(checkpoint_path(neighborhood_name, seen['seq'])):
+            return None
+
+        hashes = array('Q')
+        with open(seen_hashes_path(neighborhood_name), 'r+b') as f:
+            hashes.frombytes(f.read(seen['count'] * 8))
+            # Drop hashes appended after the state was last written, new ones go right after the counted ones
+            f.truncate(seen['count'] * 8)
+        if len(hashes) != seen['count']:
+            return None
+        seen['hashes'] = hashes
+        return seen
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def progress_path(neighborhood_name):
+    return os.path.join(CHECKPOINT_DIR, f'progress_{neighborhood_name}.json')
+
+
+def save_progress(neighborhood_name, pages_done, checkpoint_num, complete=False):
+    """Record the last fully scraped page so a restart can skip ahead"""
+    progress = {'page': pages_done, 'seq': checkpoint_num, 'complete': complete}
+    write_file_atomic(progress_path(neighborhood_name), orjson.dumps(progress))
+
+
+def load_progress(neighborhood_name):
+    """Load the saved page progress, starting over if there is none or FORCE_RESCRAPE is set"""
+    progress = None if FORCE_RESCRAPE else load_json_file(progress_path(neighborhood_name))
+    return progress or {'page': 0, 'seq': 0, 'complete': False}
+
+
+def index_checkpoints():
+    """Scan CHECKPOINT_DIR once and group checkpoint files by neighborhood - thread-safe"""
+    global checkpoint_index
+    with checkpoint_index_lock:
+        if checkpoint_index is not None:
+            return checkpoint_index
+
+        index = {}
+        for entry in os.scandir(CHECKPOINT_DIR):
+            match = CHECKPOINT_FILE_PATTERN.fullmatch(entry.name)
+            if match:
+                files = index.setdefault(match.group(1), {'checkpoints': [], 'legacy': None})
+                files['checkpoints'].append((int(match.group(2)), entry.name))
+                continue
+
+            match = LEGACY_CHECKPOINT_FILE_PATTERN.fullmatch(entry.name)
+            if match:
+                files = index.setdefault(match.group(1), {'checkpoints': [], 'legacy': None})
+                key = (match.group(2), int(match.group(3)))
+                if files['legacy'] is None or key > files['legacy'][0]:
+                    files['legacy'] = (key, entry.name)
+
+        for files in index.values():
+            files['checkpoints'].sort()
+        checkpoint_index = index
+        return checkpoint_index
+
+
+def load_legacy_checkpoint(checkpoint_file):
+    """Load the records of a single-file JSON checkpoint written by older versions"""
+    with open(os.path.join(CHECKPOINT_DIR, checkpoint_file), 'rb') as f:
+        checkpoint_data = orjson.loads(f.read())
+
+    # Handle both old and new checkpoint formats
+    if isinstance(checkpoint_data, list):
+        # Old format - just data
+        return checkpoint_data
+    # New format - data + seen_hashes
+    return checkpoint_data.get('data', [])
+
+
+def iter_checkpoint_records(neighborhood_name, checkpoint_num, first_num=0, offset=0):
+    """Stream the records of checkpoint files first_num..checkpoint_num, starting at offset in the first one"""
+    for num in range(first_num, checkpoint_num + 1):
+        checkpoint_file = checkpoint_path(neighborhood_name, num)
+        if not os.path.exists(checkpoint_file):
+            continue
+        with open(checkpoint_file, 'rb') as f:
+            if num == first_num:
+                f.seek(offset)
+            for line in f:
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    thread_safe_log(f"Skipping truncated record in {checkpoint_file}", 'warning')
+
+
+def load_latest_checkpoint(neighborhood_name):
+    """Rebuild the seen hashes and record count from the checkpoint files - thread-safe
+
+    Also returns the hashes that are not in the seen hashes sidecar yet, to be appended at the next checkpoint
+    """
+    with checkpoint_locks[neighborhood_name]:
+        try:
+            files = index_checkpoints().get(neighborhood_name)
+            if files is None:
+                return set(), [], 0, 0
+
+            seen = None
+            if files['checkpoints']:
+                checkpoint_num = files['checkpoints'][-1][0]
+                seen = load_seen_hashes(neighborhood_name, checkpoint_num)
             else:
-                # New format - data + seen_hashes
-                data = checkpoint_data.get('data', [])
-                seen_hashes = set(checkpoint_data.get('seen_hashes', []))
+                # Carry the old checkpoint over into the append-only format,
+                # dropping any duplicates the oldest checkpoints may still hold
+                checkpoint_num = 0
+                migrated_hashes = set()
+                # Migrate into a temporary file and only move it into place once complete, an interrupted
+                # migration must not leave a partial checkpoint that hides the legacy one from the next run
+                migrated_path = checkpoint_path(neighborhood_name, checkpoint_num) + '.tmp'
+                with open(migrated_path, 'wb') as checkpoint:
+                    for record in load_legacy_checkpoint(files['legacy'][1]):
+                        record['_h'] = create_record_hash(record)
+                        if record['_h'] not in migrated_hashes:
+                            migrated_hashes.add(record['_h'])
+                            checkpoint.write(orjson.dumps(record) + b'\n')
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                os.replace(migrated_path, checkpoint_path(neighborhood_name, checkpoint_num))
+
+            # Only the hashes are kept in memory, the records stay on disk
+            if seen is None:
+                # Start the sidecar over, every hash gets appended again at the next checkpoint
+                open(seen_hashes_path(neighborhood_name), 'wb').close()
+                seen_hashes, record_count, first_num, offset = set(), 0, 0, 0
+            else:
+                seen_hashes, record_count = set(seen['hashes']), seen['records']
+                first_num, offset = seen['seq'], seen['offset']
+            # Hash whatever was appended after the sidecar was last written
+            unsaved_hashes = []
+            for record in iter_checkpoint_records(neighborhood_name, checkpoint_num, first_num, offset):
+                record_hash = stored_record_hash(record)
+                seen_hashes.add(record_hash)
+                unsaved_hashes.append(record_hash)
+                record_count += 1
 
             thread_safe_log(
-                f"Loaded checkpoint {checkpoint_num} with {len(data)} records and {len(seen_hashes)} seen hashes for {neighborhood_name}")
-            return data, seen_hashes, checkpoint_num
+                f"Loaded checkpoint {checkpoint_num} with {record_count} records and {len(seen_hashes)} seen hashes for {neighborhood_name}")
+            return seen_hashes, unsaved_hashes, record_count, checkpoint_num
         except Exception as e:
             thread_safe_log(f"Error loading checkpoint: {e}", 'error')
-            return None, set(), 0
-
-
-def wait_for_page_load(browser, timeout=10):
-    """Wait for page to fully load after navigation"""
-    try:
-        wait(browser, timeout).until(
-            lambda driver: driver.execute_script("return document.readyState") == "complete"
-        )
-        time.sleep(1)  # Additional buffer
-        return True
-    except:
+            return set(), [], 0, 0
+
+
+def write_neighborhood_csv(neighborhood_name, checkpoint_num, csv_path):
+    """Stream the checkpoint records into the neighborhood CSV in batches, returning the number written"""
+    written = 0
+    # Serialize with pyarrow's C++ writer; utf-8-sig is kept by writing the BOM ourselves
+    with open(csv_path, 'wb') as f:
+        f.write(codecs.BOM_UTF8)
+        with pcsv.CSVWriter(f, CSV_SCHEMA) as writer:
+            batch = []
+            for record in iter_checkpoint_records(neighborhood_name, checkpoint_num):
+                batch.append(record)
+                if len(batch) == CSV_BATCH_SIZE:
+                    # The schema only has the output columns, so '_h' is left out
+                    writer.write_table(pa.Table.from_pylist(batch, schema=CSV_SCHEMA))
+                    written += len(batch)
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=CSV_SCHEMA))
+                written += len(batch)
+    return written
+
+
+def results_rendered(driver):
+    """Wait condition: the results table shows at least one data row below its header"""
+    return len(driver.find_elements(*RESULTS_ROWS)) > 1
+
+
+def go_to_next_page(browser, neighborhood_name):
+    """Click the "next" button, returning False when there is no further page
+
+    Raises if the next page did not show up, so the current page number is never reused for it
+    """
+    status = browser.execute_async_script(NEXT_PAGE_SCRIPT, NEXT_PAGE_TIMEOUT * 1000)
+    if status == 'missing':
+        thread_safe_log(f"No next button found - reached end for {neighborhood_name}")
         return False
+    if status == 'unavailable':
+        thread_safe_log(f"Next button not available - reached end for {neighborhood_name}")
+        return False
+    if status == 'timeout':
+        raise RuntimeError(f"Table did not change after clicking next for {neighborhood_name}")
+    return True
 
 
 def process_neighborhood(neighborhood_data):
@@ -205,134 +686,132 @@ def process_neighborhood(neighborhood_data):
     
     thread_safe_log(f"Processing neighborhood: {neighborhood_name} (ID: {neighborhood_id})")
 
+    checkpoint = None
     browser = None
+    healthy = True
     try:
-        # Load existing data and seen hashes
-        all_data, seen_hashes, checkpoint_num = load_latest_checkpoint(neighborhood_name)
-        if all_data is None:
-            all_data = []
-            seen_hashes = set()
-            checkpoint_num = 0
-
-        initial_count = len(all_data)
-        thread_safe_log(f"Starting with {initial_count} existing records for {neighborhood_name}")
-
-        # Create browser instance for this thread
-        browser = create_browser()
+        # Load seen hashes of the existing data; new records are appended to the checkpoint as they come
+        seen_hashes, unsaved_hashes, record_count, checkpoint_num = load_latest_checkpoint(neighborhood_name)
+        checkpoint = open_checkpoint(neighborhood_name, checkpoint_num)
+
+        thread_safe_log(f"Starting with {record_count} existing records for {neighborhood_name}")
+
+        # A neighborhood scraped to the last page already has its CSV, no need to open the browser
+        progress = load_progress(neighborhood_name)
+        if progress['complete'] and os.path.exists(f'{DATA_DIR}/{neighborhood_name}.csv'):
+            thread_safe_log(f"All pages of {neighborhood_name} were already scraped, set FORCE_RESCRAPE=1 to scrape again")
+            return record_count
+
+        # Borrow a browser from the pool instead of starting a new one for every neighborhood
+        browser = browser_pool.acquire()
         
         # Navigate directly to the neighborhood deals page
         url = f'https://www.nadlan.gov.il/?view=neighborhood&id={neighborhood_id}&page=deals'
         thread_safe_log(f"Accessing URL: {url}")
         browser.get(url)
 
-        # Wait for page to load completely
-        if not wait_for_page_load(browser):
-            thread_safe_log(f"Initial page load failed for {neighborhood_name}", 'error')
-            return len(all_data)
-
-        # Wait for the main table to load
+        # Wait for the main table to load, an empty table may still be waiting for its rows
         try:
-            wait(browser, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "mainTable"))
-            )
+            wait(browser, 10).until(results_rendered)
         except:
             thread_safe_log(f"Main table did not load for {neighborhood_name}", 'error')
-            return len(all_data)
+            return record_count
 
-        records_since_last_checkpoint = 0
         has_next = True
         page_num = 1
         duplicates_found = 0
+        known_rows_skipped = 0
         new_records_this_session = 0
 
+        # Skip the pages an earlier run already scraped
+        if progress['page']:
+            thread_safe_log(f"Resuming {neighborhood_name} after page {progress['page']}")
+            try:
+                while has_next and page_num <= progress['page']:
+                    has_next = go_to_next_page(browser, neighborhood_name)
+                    page_num += 1
+            except Exception as e:
+                thread_safe_log(f"Error skipping to page {progress['page'] + 1} for {neighborhood_name}: {e}", 'error')
+                has_next = False
+
+        # Pages up to here are fully scraped, a page with a row that could not be read holds it back.
+        # What an earlier run finished stays done even if skipping past it failed this time
+        last_complete_page = progress['page']
+
         while has_next and page_num <= MAX_PAGES:
             thread_safe_log(f"Processing page {page_num} for {neighborhood_name}")
 
-            # Wait for page to load after navigation
-            if not wait_for_page_load(browser):
-                thread_safe_log(f"Page {page_num} failed to load properly for {neighborhood_name}", 'error')
+            # Read the main cells of all rows of the page (header row is skipped by the script)
+            try:
+                rows = browser.execute_script(ROW_CELLS_SCRIPT)
+                thread_safe_log(f"Found {len(rows)} rows on page {page_num} for {neighborhood_name}")
+            except Exception as e:
+                thread_safe_log(f"Error extracting rows for {neighborhood_name}: {e}", 'error')
                 break
 
-            # Find the table with retries
-            table = None
-            for retry in range(3):
-                try:
-                    tables = browser.find_elements(By.CLASS_NAME, "mainTable")
-                    if tables:
-                        table = tables[0]
-                        break
-                except StaleElementReferenceException:
-                    thread_safe_log(f"Retrying to find mainTable (attempt {retry + 1}/3) for {neighborhood_name}...", 'warning')
-                    time.sleep(2)
-
-            if not table:
-                thread_safe_log(f"Could not find mainTable after retries for {neighborhood_name}. Stopping.", 'error')
+            # An empty page did not render, stop before it is recorded as done so the next run retries it
+            if not rows:
+                thread_safe_log(f"No rows on page {page_num} for {neighborhood_name}, leaving it for the next run", 'warning')
                 break
 
-            # Get all rows
+            # Only rows whose own transaction is new get expanded, a known row was saved with all of its transactions
+            page_complete = True
+            new_rows = []
+            for i, features in enumerate(rows, start=1):
+                # Get basic row data
+                base_row_data = {
+                    'כתובת': safe_get(features, 1),
+                    'מ"ר': safe_get(features, 2),
+                    'תאריך עסקה': safe_get(features, 3),
+                    'מחיר': safe_get(features, 4),
+                    'גוש/חלקה/תת-חלקה': safe_get(features, 5),
+                    'סוג נכס': safe_get(features, 6),
+                    'חדרים': safe_get(features, 7),
+                    'קומה': safe_get(features, 8)
+                }
+                if create_record_hash(base_row_data) in seen_hashes:
+                    known_rows_skipped += 1
+                    continue
+                new_rows.append((i, base_row_data))
+
+            # Expand the new rows and read their inner tables
             try:
-                sell_row_data = table.find_elements(By.CLASS_NAME, "mainTable__row")
-                thread_safe_log(f"Found {len(sell_row_data)} rows on page {page_num} for {neighborhood_name}")
+                inner_tables = []
+                if new_rows:
+                    inner_tables = browser.execute_async_script(EXPAND_ROWS_SCRIPT, [i - 1 for i, _ in new_rows],
+                                                                ROW_EXPAND_TIMEOUT * 1000)
+                if isinstance(inner_tables, dict):
+                    raise RuntimeError(inner_tables['error'])
             except Exception as e:
-                thread_safe_log(f"Error finding rows for {neighborhood_name}: {e}", 'error')
+                thread_safe_log(f"Error expanding rows for {neighborhood_name}: {e}", 'error')
                 break
 
-            # Process each row (skip header row)
-            for i in range(1, len(sell_row_data)):
+            # Process each new row
+            for (i, base_row_data), expanded_features in zip(new_rows, inner_tables):
                 try:
-                    # Scroll to element to ensure it's visible
-                    browser.execute_script("arguments[0].scrollIntoView(true);", sell_row_data[i])
-                    time.sleep(0.2)
-
-                    # Get basic row data
-                    features = sell_row_data[i].find_elements(By.CLASS_NAME, "mainTable__cell")
-                    base_row_data = {
-                        'כתובת': safe_get(features, 1),
-                        'מ"ר': safe_get(features, 2),
-                        'תאריך עסקה': safe_get(features, 3),
-                        'מחיר': safe_get(features, 4),
-                        'גוש/חלקה/תת-חלקה': safe_get(features, 5),
-                        'סוג נכס': safe_get(features, 6),
-                        'חדרים': safe_get(features, 7),
-                        'קומה': safe_get(features, 8)
-                    }
-
-                    # Expand row for additional details
-                    arrows = sell_row_data[i].find_elements(By.CLASS_NAME, "collapseArrow")
-                    if not arrows:
+                    if expanded_features is None:
                         thread_safe_log(f"No collapse arrow found for row {i} in {neighborhood_name}", 'warning')
                         continue
 
-                    arrow = arrows[0]
-                    browser.execute_script("arguments[0].click();", arrow)
-                    time.sleep(0.3)
-
-                    # Get expanded details
-                    try:
-                        inner_containers = table.find_elements(By.CLASS_NAME, "innerTablesContainer")
-                        if inner_containers:
-                            expanded_features = inner_containers[0].find_elements(By.CLASS_NAME, "innerTable__cell")
-                            
-                            # Add the additional property details to base_row_data
-                            base_row_data.update({
-                                'שנת בנייה': safe_get(expanded_features, 3),
-                                'מחיר למ"ר': safe_get(expanded_features, 4),
-                                'קומות במבנה': safe_get(expanded_features, 5)
-                            })
-                            
-                            # Extract all transactions (original + additional ones)
-                            transactions = extract_multiple_transactions(expanded_features, base_row_data)
-                            
-                    except Exception as e:
-                        thread_safe_log(f"Could not get expanded details for row {i} in {neighborhood_name}: {e}", 'warning')
-                        # If expansion fails, just use the original row
-                        transactions = [base_row_data]
-
-                    # Collapse the row back
-                    browser.execute_script("arguments[0].click();", arrow)
-                    time.sleep(0.2)
+                    if not expanded_features:
+                        # Writing the base row alone would make it known and it would never be expanded again,
+                        # so nothing is written and the page stays open for the next run to retry the row
+                        thread_safe_log(f"Could not get expanded details for row {i} in {neighborhood_name}, leaving it for the next run", 'warning')
+                        page_complete = False
+                        continue
+
+                    # Add the additional property details to base_row_data
+                    base_row_data.update({
+                        'שנת בנייה': safe_get(expanded_features, 3),
+                        'מחיר למ"ר': safe_get(expanded_features, 4),
+                        'קומות במבנה': safe_get(expanded_features, 5)
+                    })
+
+                    # Extract all transactions (original + additional ones)
+                    transactions = extract_multiple_transactions(expanded_features, base_row_data)
 
                     # Process each transaction (including the original)
+                    lines = []
                     for transaction in transactions:
                         # Check for duplicates
                         record_hash = create_record_hash(transaction)
@@ -340,83 +819,81 @@ def process_neighborhood(neighborhood_data):
                             duplicates_found += 1
                             continue
 
-                        # Add to our data
-                        all_data.append(transaction)
+                        # Add to our data, keeping the hash with the record for the final dedup
+                        transaction['_h'] = record_hash
+                        lines.append(orjson.dumps(transaction) + b'\n')
                         seen_hashes.add(record_hash)
-                        records_since_last_checkpoint += 1
-                        new_records_this_session += 1
+                        unsaved_hashes.append(record_hash)
+
+                    # The whole row goes out in one write, so a buffer flush can't leave half of it on disk
+                    checkpoint.write(b''.join(lines))
+                    record_count += len(lines)
+                    new_records_this_session += len(lines)
 
                     # Save checkpoint periodically
-                    if records_since_last_checkpoint >= CHECKPOINT_INTERVAL:
-                        checkpoint_num += 1
-                        save_checkpoint(all_data, seen_hashes, checkpoint_num, neighborhood_name)
-                        records_since_last_checkpoint = 0
+                    if len(unsaved_hashes) >= CHECKPOINT_INTERVAL:
+                        checkpoint, checkpoint_num = save_checkpoint(checkpoint, checkpoint_num, unsaved_hashes,
+                                                                     record_count, neighborhood_name, last_complete_page)
+                        unsaved_hashes = []
 
                 except Exception as e:
                     thread_safe_log(f"Error processing row {i} on page {page_num} for {neighborhood_name}: {e}", 'error')
+                    page_complete = False
                     continue
 
+            # The page is done, mark it in the progress file unless it or an earlier page has a row to retry
+            if page_complete and last_complete_page == page_num - 1:
+                last_complete_page = page_num
+            checkpoint, checkpoint_num = save_checkpoint(checkpoint, checkpoint_num, unsaved_hashes, record_count,
+                                                         neighborhood_name, last_complete_page)
+            unsaved_hashes = []
+
             # Check for next page
-            has_next = False
             try:
-                next_buttons = browser.find_elements(By.ID, "next")
-                if next_buttons:
-                    next_button = next_buttons[0]
-                    if next_button.is_displayed() and next_button.is_enabled():
-                        # Scroll to next button
-                        browser.execute_script("arguments[0].scrollIntoView(true);", next_button)
-                        time.sleep(0.5)
-
-                        # Click next button
-                        browser.execute_script("arguments[0].click();", next_button)
-                        thread_safe_log(f"Navigated to page {page_num + 1} for {neighborhood_name}")
-                        time.sleep(3)  # Wait for navigation
-
-                        page_num += 1
-                        has_next = (page_num <= MAX_PAGES)
-                    else:
-                        thread_safe_log(f"Next button not available - reached end for {neighborhood_name}")
+                has_next = go_to_next_page(browser, neighborhood_name)
+                if has_next:
+                    thread_safe_log(f"Navigated to page {page_num + 1} for {neighborhood_name}")
+                    page_num += 1
                 else:
-                    thread_safe_log(f"No next button found - reached end for {neighborhood_name}")
+                    checkpoint_writes.put((save_progress, (neighborhood_name, last_complete_page, checkpoint_num,
+                                                          last_complete_page == page_num)))
             except Exception as e:
                 thread_safe_log(f"Error navigating to next page for {neighborhood_name}: {e}", 'error')
                 has_next = False
 
         # Save final checkpoint
-        if records_since_last_checkpoint > 0:
-            checkpoint_num += 1
-            save_checkpoint(all_data, seen_hashes, checkpoint_num, neighborhood_name)
+        if unsaved_hashes:
+            checkpoint, checkpoint_num = save_checkpoint(checkpoint, checkpoint_num, unsaved_hashes, record_count,
+                                                         neighborhood_name, last_complete_page)
 
         # Save final CSV
-        if all_data:
-            # Remove any remaining duplicates (just in case)
-            df = pd.DataFrame(all_data)
-            df_unique = df.drop_duplicates(subset=['כתובת', 'תאריך עסקה', 'מחיר', 'גוש/חלקה/תת-חלקה'])
-
+        if record_count:
+            # Records were deduplicated as they were appended, so they can go straight to the CSV
             csv_path = f'{DATA_DIR}/{neighborhood_name}.csv'
-            df_unique.to_csv(csv_path, index=False, encoding='utf-8-sig')
+            written = write_neighborhood_csv(neighborhood_name, checkpoint_num, csv_path)
 
             thread_safe_log(f"Completed {neighborhood_name}:")
-            thread_safe_log(f"  - Total unique records: {len(df_unique)}")
+            thread_safe_log(f"  - Total unique records: {written}")
             thread_safe_log(f"  - New records this session: {new_records_this_session}")
             thread_safe_log(f"  - Duplicates skipped: {duplicates_found}")
-            thread_safe_log(f"  - Records removed in final dedup: {len(df) - len(df_unique)}")
+            thread_safe_log(f"  - Known rows skipped without expanding: {known_rows_skipped}")
             thread_safe_log(f"  - Saved to: {csv_path}")
 
-            return len(df_unique)
+            return written
         else:
             thread_safe_log(f"No data was collected for {neighborhood_name}", 'warning')
             return 0
 
     except Exception as e:
         thread_safe_log(f"Error processing neighborhood {neighborhood_name}: {e}", 'error')
+        # The browser may be left in an unknown state, don't hand it to the next neighborhood
+        healthy = False
         return 0
     finally:
+        if checkpoint:
+            checkpoint.close()
         if browser:
-            try:
-                browser.quit()
-            except:
-                pass
+            browser_pool.release(browser, healthy)
 
 
 def main():
@@ -429,25 +906,33 @@ def main():
     total_records = 0
     results = {}
 
-    # Use ThreadPoolExecutor for parallel processing
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all neighborhood processing tasks
-        future_to_neighborhood = {
-            executor.submit(process_neighborhood, neighborhood_data): neighborhood_data["name"]
-            for neighborhood_data in NEIGHBORHOOD_IDS
-        }
-
-        # Collect results as they complete
-        for future in as_completed(future_to_neighborhood):
-            neighborhood_name = future_to_neighborhood[future]
-            try:
-                records = future.result()
-                results[neighborhood_name] = records
-                total_records += records
-                thread_safe_log(f"Completed {neighborhood_name}: {records} records")
-            except Exception as e:
-                thread_safe_log(f"Failed to process {neighborhood_name}: {e}", 'error')
-                results[neighborhood_name] = 0
+    writer = Thread(target=checkpoint_writer, daemon=True)
+    writer.start()
+    try:
+        # Use ThreadPoolExecutor for parallel processing
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Submit all neighborhood processing tasks
+            future_to_neighborhood = {
+                executor.submit(process_neighborhood, neighborhood_data): neighborhood_data["name"]
+                for neighborhood_data in NEIGHBORHOOD_IDS
+            }
+
+            # Collect results as they complete
+            for future in as_completed(future_to_neighborhood):
+                neighborhood_name = future_to_neighborhood[future]
+                try:
+                    records = future.result()
+                    results[neighborhood_name] = records
+                    total_records += records
+                    thread_safe_log(f"Completed {neighborhood_name}: {records} records")
+                except Exception as e:
+                    thread_safe_log(f"Failed to process {neighborhood_name}: {e}", 'error')
+                    results[neighborhood_name] = 0
+    finally:
+        browser_pool.close_all()
+        # Let the queued checkpoint writes finish before exiting
+        checkpoint_writes.put(None)
+        writer.join()
 
     thread_safe_log(f"Multi-threaded scraping completed!")
     thread_safe_log(f"Results summary:")